@@ -0,0 +1,90 @@
+"""
+NumPy (and optionally Numba) implementation of the streak analytics.
+Importing this module fails without NumPy; analytics.py falls back to pure Python then.
+"""
+from datetime import date
+from typing import List, Optional, Tuple
+import numpy as np
+from models import HabitCompletion, Periodicity
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional, longest_run falls back to vectorized operations
+    njit = None
+
+# datetime.date ordinal of 1970-01-01, the epoch of numpy.datetime64
+_EPOCH_ORDINAL = 719163
+
+def get_streak_details(completions: List[HabitCompletion], periodicity: Periodicity) -> Tuple[int, Optional[date], Optional[date]]:
+    """
+    Vectorized variant of analytics.get_streak_details() for large completion lists.
+    Maps every completion day to an integer period index (vectorized equivalents of
+    analytics.PERIOD_INDEX), so a streak is a run of indices that never increase by
+    more than 1 from one day to the next.
+    """
+    # np.unique sorts and removes duplicate days in one step
+    ords = np.unique(np.fromiter(
+        (c.completed_at.toordinal() for c in completions), dtype=np.int64, count=len(completions)
+    ))
+
+    if periodicity == Periodicity.DAILY:
+        periods = ords
+    elif periodicity == Periodicity.WEEKLY:
+        periods = (ords - 1) // 7
+    elif periodicity == Periodicity.MONTHLY:
+        days = (ords - _EPOCH_ORDINAL).astype("datetime64[D]")
+        periods = days.astype("datetime64[M]").astype(np.int64)
+    else:
+        raise ValueError("Invalid periodicity")
+
+    length, start, end = longest_run(periods)
+    return int(length), date.fromordinal(int(ords[start])), date.fromordinal(int(ords[end]))
+
+def _longest_run_vectorized(periods):
+    """
+    Finds the longest run of consecutive period indices in a sorted int64 array.
+    Repeated indices (several days in the same period) continue a run without extending it.
+
+    Returns:
+        Tuple of (run length in periods, index of its first element, index of its last element).
+    """
+    steps = np.diff(periods)
+    # Each gap of more than one period starts a new streak
+    group_ids = np.concatenate(([0], np.cumsum(steps > 1)))
+    # Count the distinct periods per streak, not the days
+    new_period = np.concatenate(([True], steps != 0))
+    lengths = np.bincount(group_ids[new_period])
+
+    best = int(lengths.argmax())  # argmax returns the earliest streak on ties
+    start = np.searchsorted(group_ids, best, side="left")
+    end = np.searchsorted(group_ids, best, side="right") - 1
+    return lengths[best], start, end
+
+def _longest_run_loop(periods):
+    """
+    Same contract as _longest_run_vectorized(), written as a plain integer loop for Numba.
+    Only receives and returns numbers, so it compiles in nopython mode.
+    """
+    best_length = 1
+    best_start = 0
+    best_end = 0
+    current_length = 1
+    current_start = 0
+    for i in range(1, periods.shape[0]):
+        step = periods[i] - periods[i - 1]
+        if step == 1:
+            current_length += 1
+        elif step > 1:
+            current_length = 1
+            current_start = i
+
+        if current_length > best_length:
+            best_length = current_length
+            best_start = current_start
+            best_end = i
+        elif current_start == best_start:
+            # Still inside the best streak, e.g. another day in the same week
+            best_end = i
+    return best_length, best_start, best_end
+
+longest_run = njit(cache=True)(_longest_run_loop) if njit is not None else _longest_run_vectorized
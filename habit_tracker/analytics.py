@@ -1,8 +1,50 @@
-from datetime import datetime, timedelta
+from collections import defaultdict
+from datetime import date
 from typing import List, Optional, Tuple
 from models import Habit, HabitCompletion, Periodicity
 
-def calculate_streak(completions: List[HabitCompletion], periodicity: Periodicity) -> int:
+# Below this many completions the NumPy conversion costs more than the Python loop
+NUMPY_MIN_COMPLETIONS = 1000
+
+# Number of recent completions loaded first by ongoing_streak()
+RECENT_COMPLETIONS_LIMIT = 400
+
+# The NumPy implementation, imported on first use: None until tried, False if unavailable
+_numpy_backend = None
+
+# This module is kept pure Python and standard library only, so it runs unchanged
+# (and JIT-compiles well) under PyPy. The streak loops deliberately work on plain
+# integers: every periodicity maps a day ordinal (date.toordinal()) to an integer
+# period index, so consecutive periods differ by exactly 1 and walking back is
+# "index -= 1". NumPy/Numba code belongs in _analytics_numpy.py, and
+# HabitRepository.longest_streak() uses the same period indices in SQL.
+def _month_index(ordinal: int) -> int:
+    d = date.fromordinal(ordinal)
+    return d.year * 12 + d.month
+
+PERIOD_INDEX = {
+    Periodicity.DAILY: lambda ordinal: ordinal,
+    # Ordinal 1 (0001-01-01) is a Monday, so this counts whole ISO weeks
+    Periodicity.WEEKLY: lambda ordinal: (ordinal - 1) // 7,
+    Periodicity.MONTHLY: _month_index,
+}
+
+def _load_numpy_backend():
+    """
+    Imports _analytics_numpy once, on first use, so callers that never reach the
+    NumPy threshold don't pay for importing NumPy (and Numba).
+    Returns the module, or False if NumPy is not installed.
+    """
+    global _numpy_backend
+    if _numpy_backend is None:
+        try:
+            import _analytics_numpy
+            _numpy_backend = _analytics_numpy
+        except ImportError:  # NumPy is optional, the pure-Python implementation is always available
+            _numpy_backend = False
+    return _numpy_backend
+
+def calculate_streak(completions: List[HabitCompletion], periodicity: Periodicity, today: Optional[date] = None, sorted_desc: bool = False) -> int:
     """
     Calculates the current streak for a given list of completions.
     
@@ -15,6 +57,11 @@ def calculate_streak(completions: List[HabitCompletion], periodicity: Periodicit
     Args:
         completions: A list of HabitCompletion objects.
         periodicity: The periodicity of the habit.
+        today: The date to count back from (defaults to date.today()).
+            Callers evaluating many habits can pass it once for all of them.
+        sorted_desc: Whether completions are already ordered newest first, as
+            returned by the repository. Only the completions belonging to the
+            current streak are then looked at.
 
     Returns:
         int: The length of the streak.
@@ -23,101 +70,75 @@ def calculate_streak(completions: List[HabitCompletion], periodicity: Periodicit
     if not completions:
         return 0 # No completions means no streak
 
-    now = datetime.now()
-    
-    if periodicity == Periodicity.DAILY:
-        # Create a set of unique completion dates via set comprehension.
-        completed_dates = {c.completed_at.date() for c in completions}
-        
-        streak = 0
-        check_date = now.date()
-
-        # If we haven't done it today, check if we did it yesterday.
-        # If we didn't do it yesterday, the streak is 0.
-        if check_date not in completed_dates:
-            check_date -= timedelta(days=1)
-            if check_date not in completed_dates:
-                return 0
+    if periodicity not in PERIOD_INDEX:
+        raise ValueError("Invalid periodicity")
+    period_of = PERIOD_INDEX[periodicity]
+    current_period = period_of((today if today is not None else date.today()).toordinal())
 
-        while check_date in completed_dates:
-            streak += 1
-            check_date -= timedelta(days=1)
-        return streak
-    
-    elif periodicity == Periodicity.WEEKLY:
-        # Create a set of (year, week) tuples and ignore (_) the weekday of isocalendar().
-        completed_weeks = set()
-        for c in completions:
-            year, week, _ = c.completed_at.isocalendar()
-            completed_weeks.add((year, week))
-        
+    if sorted_desc:
+        # Walk from the newest completion and stop at the first gap
         streak = 0
-        # Start checking from current date.
-        check_date = now.date()
-        current_year, current_week, _ = check_date.isocalendar()
-
-        # Same logic: if not done this week, check last week
-        if (current_year, current_week) not in completed_weeks:
-            # Move back one week to safely get the previous ISO week
-            check_date -= timedelta(weeks=1)
-            current_year, current_week, _ = check_date.isocalendar()
-            if (current_year, current_week) not in completed_weeks:
-                return 0
-
-        while (current_year, current_week) in completed_weeks:
+        last_period = None
+        for c in completions:
+            period = period_of(c.completed_at.toordinal())
+            if period > current_period or period == last_period:
+                continue # Future completion, or another one in an already counted period
+            if last_period is None:
+                if period < current_period - 1:
+                    return 0 # Neither the current nor the previous period is completed
+            elif period != last_period - 1:
+                break
             streak += 1
-            # Safely move to previous week using datetime subtraction
-            check_date -= timedelta(weeks=1)
-            current_year, current_week, _ = check_date.isocalendar()
+            last_period = period
         return streak
-    
-    elif periodicity == Periodicity.MONTHLY:
-        # Create set of (year, month) tuples.
-        completed_months = {(c.completed_at.year, c.completed_at.month) for c in completions}
-        
-        streak = 0
-        check_date = now.date()
-        current_pair = (check_date.year, check_date.month)
 
-        if current_pair not in completed_months:
-            # Move to previous month safely (replace day with 1, subtract 1 day)
-            check_date = check_date.replace(day=1) - timedelta(days=1)
-            current_pair = (check_date.year, check_date.month)
-            if current_pair not in completed_months:
-                return 0
+    # Create a set of all period indices with at least one completion.
+    completed_periods = frozenset([period_of(c.completed_at.toordinal()) for c in completions])
 
-        while current_pair in completed_months:
-            streak += 1
-            # Move to previous month
-            # Go to first day of current month, then subtract 1 day to get end of prev month
-            check_date = check_date.replace(day=1) - timedelta(days=1)
-            current_pair = (check_date.year, check_date.month)
-        return streak
-    
-    else:
-        raise ValueError("Invalid periodicity")
+    streak = 0
+    period = current_period
+
+    # If we haven't done it in the current period, check the previous one.
+    # If we didn't do it then either, the streak is 0.
+    if period not in completed_periods:
+        period -= 1
+        if period not in completed_periods:
+            return 0
+
+    while period in completed_periods:
+        streak += 1
+        period -= 1
+    return streak
     
-def get_streak_details(completions: List[HabitCompletion], periodicity: Periodicity) -> Tuple[int, Optional[datetime], Optional[datetime]]:
+def get_streak_details(completions: List[HabitCompletion], periodicity: Periodicity) -> Tuple[int, Optional[date], Optional[date]]:
     """
     Calculates the longest streak along with the start and end dated of that streak.
+    HabitRepository.longest_streak() computes the same result in SQL for stored habits;
+    this function works on any list of completions.
     Args:
         completions: A list of HabitCompletion objects.
         periodicity: The periodicity of the habit.
     Returns:
         Tuple containing:
             - int: Length of the longest streak.
-            - Optional[datetime]: Start date of the longest streak (None if no streak).
-            - Optional[datetime]: End date of the longest streak (None if no streak).
+            - Optional[date]: Start date of the longest streak (None if no streak).
+            - Optional[date]: End date of the longest streak (None if no streak).
     """
     if not completions:
         return 0, None, None
 
-    # Sort completions by date
-    sorted_completions = sorted(completions, key=lambda c: c.completed_at)
-    sorted_dates = sorted(list({c.completed_at.date() for c in sorted_completions}))
+    if len(completions) >= NUMPY_MIN_COMPLETIONS:
+        backend = _load_numpy_backend()
+        if backend:
+            return backend.get_streak_details(completions, periodicity)
 
-    if not sorted_dates:
-        return 0, None, None
+    # Dedupe and sort in one step, on integer day ordinals instead of date objects
+    ords = sorted({c.completed_at.toordinal() for c in completions})
+
+    if periodicity not in PERIOD_INDEX:
+        raise ValueError("Invalid periodicity")
+    # Compute each day's period index once, before the scan
+    periods = list(map(PERIOD_INDEX[periodicity], ords))
 
     max_streak = 0
     current_streak = 0
@@ -125,76 +146,84 @@ def get_streak_details(completions: List[HabitCompletion], periodicity: Periodic
     max_start = None
     max_end = None
 
-    # We iterate through the sorted unique dates to find the longest sequence
-    for i, date_obj in enumerate(sorted_dates):
+    # We iterate through the sorted unique days to find the longest sequence
+    for i, ordinal in enumerate(ords):
         if i == 0:
             current_streak = 1
-            current_start = date_obj
-            max_streak = 1
-            max_start = date_obj
-            max_end = date_obj
+            current_start = ordinal
             continue
 
-        prev_date = sorted_dates[i-1]
-        
-        # Check continuity based on periodicity
-        is_consecutive = False
-        
-        if periodicity == Periodicity.DAILY:
-            is_consecutive = (date_obj - prev_date).days == 1
-            
-        elif periodicity == Periodicity.WEEKLY:
-            y1, w1, _ = date_obj.isocalendar()
-            y2, w2, _ = prev_date.isocalendar()
-            # Check if year/week are consecutive
-            monday1 = date_obj - timedelta(days=date_obj.weekday())
-            monday2 = prev_date - timedelta(days=prev_date.weekday())
-            is_consecutive = (monday1 - monday2).days == 7
-            
-        elif periodicity == Periodicity.MONTHLY:
-            # Check if year/month are consecutive
-            # (year * 12 + month) - (prev_year * 12 + prev_month) == 1
-            diff = (date_obj.year * 12 + date_obj.month) - (prev_date.year * 12 + prev_date.month)
-            is_consecutive = diff == 1
+        prev_ordinal = ords[i-1]
+        # Number of periods between this completion and the previous one
+        step = periods[i] - periods[i-1]
+
+        if step == 0:
+            # Another completion within the same week/month neither extends nor breaks the streak
+            continue
 
-        if is_consecutive:
+        if step == 1:
             current_streak += 1
         else:
-            # Check if we should reset (gap found)
-            # Important: For weekly/monthly, multiple completions in same period are filtered by set(),
-            # so we only see unique periods here. Gaps mean streak breaks.
-            
-            # Compare current streak to max
+            # Gap found: compare current streak to max
             if current_streak > max_streak:
                 max_streak = current_streak
                 max_start = current_start
-                max_end = prev_date # End of the previous sequence
+                max_end = prev_ordinal # End of the previous sequence
             
             # Reset
             current_streak = 1
-            current_start = date_obj
+            current_start = ordinal
     
     # Final check after loop
     if current_streak > max_streak:
         max_streak = current_streak
         max_start = current_start
-        max_end = sorted_dates[-1]
+        max_end = ords[-1]
 
-    return max_streak, max_start, max_end
+    return max_streak, date.fromordinal(max_start), date.fromordinal(max_end)
 
-def longest_ongoing_streak_for_habit(habit: Habit, completions: List[HabitCompletion]) -> int:
+def longest_ongoing_streak_for_habit(habit: Habit, completions: List[HabitCompletion], today: Optional[date] = None, sorted_desc: bool = False) -> int:
     """Wrapper to calculate streak for a specific habit object."""
-    return calculate_streak(completions, habit.periodicity)
+    return calculate_streak(completions, habit.periodicity, today, sorted_desc)
+
+def ongoing_streak(repo, habit: Habit, today: Optional[date] = None) -> int:
+    """
+    Calculates the current streak of a stored habit from its most recent completions.
+    All completions are only loaded if the streak may reach past the recent ones.
+
+    Args:
+        repo: The HabitRepository to load completions from.
+        habit: The habit to calculate the streak for.
+        today: The date to count back from (defaults to date.today()).
+    """
+    if today is None:
+        today = date.today()
+    completions = repo.list_habit_completions(habit.id, limit=RECENT_COMPLETIONS_LIMIT)
+    streak = calculate_streak(completions, habit.periodicity, today, sorted_desc=True)
+
+    if streak > 0 and len(completions) == RECENT_COMPLETIONS_LIMIT:
+        # The streak started in the current or the previous period. If it reaches the
+        # oldest loaded completion, older ones may continue it.
+        period_of = PERIOD_INDEX[habit.periodicity]
+        if period_of(completions[-1].completed_at.toordinal()) >= period_of(today.toordinal()) - streak:
+            completions = repo.list_habit_completions(habit.id)
+            streak = calculate_streak(completions, habit.periodicity, today, sorted_desc=True)
+    return streak
 
 def longest_ongoing_streak_overall(habits: List[Habit], all_completions: List[HabitCompletion]) -> int:
     """
     Higher-order function to find the max streak across all habits.
     """
+    # Bucket completions by habit in a single pass instead of re-scanning per habit
+    completions_by_habit = defaultdict(list)
+    for c in all_completions:
+        completions_by_habit[c.habit_id].append(c)
+
+    today = date.today()
     max_streak = 0
     for habit in habits:
-        # Filter completions for this specific habit
-        habit_completions = [c for c in all_completions if c.habit_id == habit.id]
-        streak = calculate_streak(habit_completions, habit.periodicity)
+        habit_completions = completions_by_habit.get(habit.id, [])
+        streak = calculate_streak(habit_completions, habit.periodicity, today)
         if streak > max_streak:
             max_streak = streak
     return max_streak
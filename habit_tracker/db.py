@@ -1,6 +1,7 @@
 import sqlite3
-from datetime import datetime
-from typing import List, Optional
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
 from models import Habit, HabitCompletion, Periodicity
 
 class HabitRepository:
@@ -11,15 +12,30 @@ class HabitRepository:
 
     def __init__(self, db_path: str = "main.db"):
         self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
 
     def get_connection(self) -> sqlite3.Connection:
-        """Establishes a connection to the SQLite database."""
-        conn = sqlite3.connect(self.db_path)
-        # Enable foreign key support
-        conn.execute("PRAGMA foreign_keys = ON")
-        # Return rows as sqlite3.Row objects to access columns by name
-        conn.row_factory = sqlite3.Row
-        return conn
+        """
+        Returns the repository's SQLite connection, opening it on first use.
+        The connection is reused for all operations until close() is called.
+        """
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path)
+            # Enable foreign key support
+            conn.execute("PRAGMA foreign_keys = ON")
+            # Write-ahead logging with NORMAL sync avoids a full fsync on every commit
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            # Return rows as sqlite3.Row objects to access columns by name
+            conn.row_factory = sqlite3.Row
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        """Closes the database connection, if one is open."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
     def create_tables(self):
         """Creates the necessary tables if they do not exist."""
@@ -34,17 +50,53 @@ class HabitRepository:
                     created_at TEXT NOT NULL
                 )
             """)
-            # Create habit_completions table
+            # Create habit_completions table.
+            # completed_at keeps the full ISO timestamp for display, completed_ordinal
+            # (date.toordinal()) is the day used for sorting, indexing and analytics.
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS habit_completions (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     habit_id INTEGER NOT NULL,
                     completed_at TEXT NOT NULL,
+                    completed_ordinal INTEGER NOT NULL,
                     FOREIGN KEY (habit_id) REFERENCES habits (id) ON DELETE CASCADE
                 )
             """)
+            self._migrate_completed_ordinal(cursor)
+            # Index per-habit lookups ordered by day, and the global date ordering
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_completions_habit_date
+                ON habit_completions (habit_id, completed_ordinal DESC)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_completions_date
+                ON habit_completions (completed_at DESC)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_habits_periodicity
+                ON habits (periodicity)
+            """)
             conn.commit()
 
+    def _migrate_completed_ordinal(self, cursor: sqlite3.Cursor):
+        """
+        Adds the completed_ordinal column to databases created before it existed
+        and backfills it from the ISO timestamps.
+        """
+        cursor.execute("PRAGMA table_info(habit_completions)")
+        columns = {row["name"] for row in cursor.fetchall()}
+        if "completed_ordinal" in columns:
+            return # Already migrated, every insert fills the column
+
+        cursor.execute("ALTER TABLE habit_completions ADD COLUMN completed_ordinal INTEGER")
+        cursor.execute("SELECT id, completed_at FROM habit_completions")
+        missing = [
+            (datetime.fromisoformat(row["completed_at"]).toordinal(), row["id"])
+            for row in cursor.fetchall()
+        ]
+        if missing:
+            cursor.executemany("UPDATE habit_completions SET completed_ordinal = ? WHERE id = ?", missing)
+
     def add_habit(self, habit: Habit) -> int:
         """Inserts a new habit into the database and returns its ID."""
         with self.get_connection() as conn:
@@ -66,72 +118,194 @@ class HabitRepository:
             cursor.execute("DELETE FROM habits WHERE id = ?", (habit_id,))
             conn.commit()
     
+    @staticmethod
+    def _row_to_habit(row: sqlite3.Row) -> Habit:
+        """Builds a Habit from a row of the habits table."""
+        return Habit(
+            id=row["id"],
+            name=row["name"],
+            periodicity=Periodicity(row["periodicity"]),
+            created_at=datetime.fromisoformat(row["created_at"])
+        )
+
     def list_habits(self) -> List[Habit]:
         """Retrieves all habits from the database."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM habits")
             rows = cursor.fetchall()
+            return [self._row_to_habit(row) for row in rows]
 
-            habits = []
-            for row in rows:
-                habits.append(Habit(
-                    id=row["id"],
-                    name=row["name"],
-                    periodicity=Periodicity(row["periodicity"]),
-                    created_at=datetime.fromisoformat(row["created_at"])
-                ))
-            return habits
+    def list_habits_by_periodicity(self, periodicity: Periodicity) -> List[Habit]:
+        """Retrieves all habits with the given periodicity from the database."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM habits WHERE periodicity = ?", (periodicity.value,))
+            rows = cursor.fetchall()
+            return [self._row_to_habit(row) for row in rows]
 
     def add_habit_completion(self, habit_id: int, completed_at: datetime) -> int:
         """Inserts a new habit completion record into the database and returns its ID."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                INSERT INTO habit_completions (habit_id, completed_at)
-                VALUES (?, ?)
-            """, (habit_id, completed_at.isoformat()))
+                INSERT INTO habit_completions (habit_id, completed_at, completed_ordinal)
+                VALUES (?, ?, ?)
+            """, (habit_id, completed_at.isoformat(), completed_at.toordinal()))
             conn.commit()
             return cursor.lastrowid
 
-    def list_habit_completions(self, habit_id: int) -> List[HabitCompletion]:
-        """Retrieves all completion records for a specific habit."""
+    def add_habit_completions_bulk(self, completions: List[Tuple[int, datetime]]):
+        """
+        Inserts many habit completion records in a single transaction.
+
+        Args:
+            completions: A list of (habit_id, completed_at) tuples.
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO habit_completions (habit_id, completed_at, completed_ordinal)
+                VALUES (?, ?, ?)
+            """, [
+                (habit_id, completed_at.isoformat(), completed_at.toordinal())
+                for habit_id, completed_at in completions
+            ])
+            conn.commit()
+
+    def list_habit_completions(self, habit_id: int, limit: Optional[int] = None) -> List[HabitCompletion]:
+        """
+        Retrieves the completion records for a specific habit, newest first.
+        Completions are built from the stored day ordinal, so completed_at is
+        truncated to midnight; analytics only works at day granularity anyway.
+
+        Args:
+            habit_id: The ID of the habit.
+            limit: Maximum number of (most recent) completions to return, None for all.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # A negative LIMIT means no limit in SQLite
             cursor.execute("""
-                SELECT * FROM habit_completions
+                SELECT id, habit_id, completed_ordinal FROM habit_completions
                 WHERE habit_id = ?
-                ORDER BY completed_at DESC
-            """, (habit_id,))
+                ORDER BY completed_ordinal DESC
+                LIMIT ?
+            """, (habit_id, -1 if limit is None else limit))
             rows = cursor.fetchall()
 
-            completions = []
-            for row in rows:
-                completions.append(HabitCompletion(
+            return [
+                HabitCompletion(
                     id=row["id"],
                     habit_id=row["habit_id"],
-                    completed_at=datetime.fromisoformat(row["completed_at"])
-                ))
-            return completions
+                    completed_at=datetime.fromordinal(row["completed_ordinal"])
+                )
+                for row in rows
+            ]
     
     def list_all_habit_completions(self) -> List[HabitCompletion]:
-        """Retrieves all habit completion records from the database."""
+        """Retrieves all habit completion records from the database, newest first."""
+        return [
+            HabitCompletion(
+                id=row["id"],
+                habit_id=row["habit_id"],
+                completed_at=datetime.fromisoformat(row["completed_at"])
+            )
+            for row in self.iter_all_habit_completions()
+        ]
+
+    def iter_all_habit_completions(self) -> Iterator[sqlite3.Row]:
+        """
+        Yields the id, habit_id and completed_at of all completion records, newest first.
+        Rows are fetched in batches and returned as-is, without building
+        HabitCompletion objects, so memory use stays bounded for long histories.
+        """
+        cursor = self.get_connection().cursor()
+        cursor.arraysize = 1000
+        cursor.execute("""
+            SELECT id, habit_id, completed_at FROM habit_completions
+            ORDER BY completed_at DESC
+        """)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            yield from rows
+
+    def list_completions_grouped(self) -> Dict[int, List[HabitCompletion]]:
+        """
+        Retrieves all completion records in a single query, grouped by habit ID.
+        Each habit's completions are ordered by completion date, newest first,
+        and built from the stored day ordinal like in list_habit_completions().
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT * FROM habit_completions
-                ORDER BY completed_at DESC
+                SELECT id, habit_id, completed_ordinal FROM habit_completions
+                ORDER BY habit_id, completed_ordinal DESC
             """)
             rows = cursor.fetchall()
 
-            completions = []
+            grouped = defaultdict(list)
             for row in rows:
-                completions.append(HabitCompletion(
+                grouped[row["habit_id"]].append(HabitCompletion(
                     id=row["id"],
                     habit_id=row["habit_id"],
-                    completed_at=datetime.fromisoformat(row["completed_at"])
+                    completed_at=datetime.fromordinal(row["completed_ordinal"])
                 ))
-            return completions
+            return dict(grouped)
+
+    def longest_streak(self, habit_id: int, periodicity: Periodicity) -> Tuple[int, Optional[date], Optional[date]]:
+        """
+        Calculates the longest streak of a habit directly in SQL.
+
+        Completions are collapsed to one row per period (day, ISO week or month),
+        numbered with ROW_NUMBER() and grouped by (period - row number): consecutive
+        periods share the same group, so each group is one streak ("gaps and islands").
+
+        Returns:
+            Tuple containing the streak length and the first and last completion
+            dates of that streak (None if the habit has no completions).
+        """
+        # Integer period index, the same as analytics.PERIOD_INDEX, so consecutive periods differ by exactly 1
+        if periodicity == Periodicity.DAILY:
+            period = "completed_ordinal"
+        elif periodicity == Periodicity.WEEKLY:
+            period = "(completed_ordinal - 1) / 7"
+        elif periodicity == Periodicity.MONTHLY:
+            # Convert the ordinal to a Julian day number so SQLite can split out year and month
+            period = (
+                "CAST(strftime('%Y', completed_ordinal + 1721424.5) AS INTEGER) * 12"
+                " + CAST(strftime('%m', completed_ordinal + 1721424.5) AS INTEGER)"
+            )
+        else:
+            raise ValueError("Invalid periodicity")
 
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                WITH periods AS (
+                    SELECT {period} AS period,
+                           MIN(completed_ordinal) AS first_day,
+                           MAX(completed_ordinal) AS last_day
+                    FROM habit_completions
+                    WHERE habit_id = ?
+                    GROUP BY period
+                ),
+                islands AS (
+                    SELECT period - ROW_NUMBER() OVER (ORDER BY period) AS grp,
+                           first_day,
+                           last_day
+                    FROM periods
+                )
+                SELECT COUNT(*) AS streak, MIN(first_day) AS start_day, MAX(last_day) AS end_day
+                FROM islands
+                GROUP BY grp
+                ORDER BY streak DESC, grp
+                LIMIT 1
+            """, (habit_id,))
+            row = cursor.fetchone()
 
-        
\ No newline at end of file
+            if row is None:
+                return 0, None, None
+            return row["streak"], date.fromordinal(row["start_day"]), date.fromordinal(row["end_day"])
@@ -1,7 +1,7 @@
 import questionary
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import random
-from typing import List
+from typing import Dict, List, Optional
 
 # Importing models and database functions
 from models import Habit, HabitCompletion, Periodicity
@@ -28,6 +28,8 @@ def seed_data(repo: HabitRepository):
     ]
 
     # 2. Add habits to the database and generate completion data:
+    # Completions are collected and written in one transaction at the end.
+    pending_completions = []
     for habit in sample_habits:
         habit_id = repo.add_habit(habit)
 
@@ -52,8 +54,9 @@ def seed_data(repo: HabitRepository):
                 should_complete = random.random() < 0.1
             
             if should_complete:
-                repo.add_habit_completion(habit_id, current_date)
+                pending_completions.append((habit_id, current_date))
 
+    repo.add_habit_completions_bulk(pending_completions)
     print("Database seeded successfully.")
 
 def cli():
@@ -66,6 +69,19 @@ def cli():
 
     print("Welcome to the Habit Tracker CLI!")
 
+    # Habits are loaded once and reused across menu actions, together with a
+    # name lookup for the selection prompts (habit names are unique).
+    # The cache is reset whenever a habit is created or deleted.
+    habits_cache: Optional[List[Habit]] = None
+    habit_by_name: Dict[str, Habit] = {}
+
+    def get_habits() -> List[Habit]:
+        nonlocal habits_cache, habit_by_name
+        if habits_cache is None:
+            habits_cache = repo.list_habits()
+            habit_by_name = {h.name: h for h in habits_cache}
+        return habits_cache
+
     while True:
         # Main menu options
         choice = questionary.select(
@@ -94,12 +110,13 @@ def cli():
 
             try:
                 repo.add_habit(new_habit)
+                habits_cache = None
                 print(f"Habit '|{name}|' created successfully!")
             except ValueError as e:
                 print(f"Error: {e}")
 
         elif choice == "Check off a Habit as completed":
-            habits = repo.list_habits()
+            habits = get_habits()
             if not habits:
                 print("No habits found. Please create a habit first.")
                 continue
@@ -111,9 +128,7 @@ def cli():
                 choices=habit_names
             ).ask()
 
-            # Find the selected habit with next() for efficiency
-            # next() ensures we get the first match or None combined with a generator expression
-            selected_habit = next((h for h in habits if h.name == selected_habit_name), None)
+            selected_habit = habit_by_name.get(selected_habit_name)
             
             if selected_habit:
                 repo.add_habit_completion(selected_habit.id, datetime.now())
@@ -134,7 +149,7 @@ def cli():
             ).ask()
 
             if analysis_choice == "Return a list with all currently tracked habits":
-                habits = repo.list_habits()
+                habits = get_habits()
                 if not habits:
                     print("No habits found.")
                 else:
@@ -148,8 +163,7 @@ def cli():
                     choices=["DAILY", "WEEKLY", "MONTHLY"]
                 ).ask()
                 periodicity = Periodicity(periodicity_str)
-                habits = repo.list_habits()
-                filtered_habits = [h for h in habits if h.periodicity == periodicity]
+                filtered_habits = repo.list_habits_by_periodicity(periodicity)
                 if not filtered_habits:
                     print(f"No habits found with periodicity '{periodicity.value}'.")
                 else:
@@ -158,16 +172,18 @@ def cli():
                         print(f"- {habit.name} (Created At: {habit.created_at.date()})")
             
             elif analysis_choice == "Return a list of all habit completions":
-                completions = repo.list_all_habit_completions()
-                if not completions:
+                # Rows are streamed and printed directly instead of loading every completion
+                found = False
+                for row in repo.iter_all_habit_completions():
+                    if not found:
+                        print("All habit completions:")
+                        found = True
+                    print(f"- Habit ID: {row['habit_id']}, Completed At: {row['completed_at']}")
+                if not found:
                     print("No habit completions found.")
-                else:
-                    print("All habit completions:")
-                    for completion in completions:
-                        print(f"- Habit ID: {completion.habit_id}, Completed At: {completion.completed_at}")
             
             elif analysis_choice == "Return the longest run streak for a given habit":
-                habits = repo.list_habits()
+                habits = get_habits()
                 if not habits:
                     print("No habits found. Please create a habit first.")
                     continue
@@ -178,35 +194,38 @@ def cli():
                     choices=habit_names
                 ).ask()
 
-                selected_habit = next((h for h in habits if h.name == selected_habit_name), None)
+                selected_habit = habit_by_name.get(selected_habit_name)
                 
                 if selected_habit:
-                    completions = repo.list_habit_completions(selected_habit.id)
-                    longest_streak = analytics.longest_ongoing_streak_for_habit(selected_habit, completions)
+                    longest_streak = analytics.ongoing_streak(repo, selected_habit)
                     print(f"The longest streak for habit '|{selected_habit.name}|' is {longest_streak}.")
             
             elif analysis_choice == "Return the longest run streak of all defined habits":
-                habits = repo.list_habits()
+                habits = get_habits()
                 if not habits:
                     print("No habits found. Please create a habit first.")
                     continue
 
+                # Load all completions in one query instead of one query per habit
+                completions_by_habit = repo.list_completions_grouped()
+                today = date.today()
+
                 print("Longest run streak of all defined habits:")
                 for habit in habits:
-                    completions = repo.list_habit_completions(habit.id)
-                    longest_streak = analytics.longest_ongoing_streak_for_habit(habit, completions)
+                    completions = completions_by_habit.get(habit.id, [])
+                    longest_streak = analytics.longest_ongoing_streak_for_habit(habit, completions, today, sorted_desc=True)
                     print(f"- {habit.name}: {longest_streak} - {habit.periodicity.value}")
             
             elif analysis_choice == "Return the all-time longest streak for each habit":
-                habits = repo.list_habits()
+                habits = get_habits()
                 if not habits:
                     print("No habits found.")
                     continue
 
                 print("\nAll-time longest streaks for each habit:")
                 for habit in habits:
-                    completions = repo.list_habit_completions(habit.id)
-                    streak, start, end = analytics.get_streak_details(completions, habit.periodicity)
+                    # Computed in SQL, no completions need to be loaded
+                    streak, start, end = repo.longest_streak(habit.id, habit.periodicity)
                     
                     if streak > 0:
                         start_str = start.strftime("%Y-%m-%d") if start else "N/A"
@@ -220,7 +239,7 @@ def cli():
                 continue
 
         elif choice == "Delete a Habit":
-            habits = repo.list_habits()
+            habits = get_habits()
             if not habits:
                 print("No habits found. Please create a habit first.")
                 continue
@@ -231,16 +250,19 @@ def cli():
                 choices=habit_names
             ).ask()
 
-            selected_habit = next((h for h in habits if h.name == selected_habit_name), None)
+            selected_habit = habit_by_name.get(selected_habit_name)
             
             if selected_habit:
                 repo.delete_habit(selected_habit.id)
+                habits_cache = None
                 print(f"Habit '|{selected_habit.name}|' and its completions have been deleted.")
 
         elif choice == "Exit":
             print("Exiting Habit Tracker CLI. Goodbye!")
             break
 
+    repo.close()
+
 if __name__ == "__main__":
     cli()
 
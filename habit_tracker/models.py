@@ -10,7 +10,7 @@ class Periodicity(Enum):
     WEEKLY = "WEEKLY"
     MONTHLY = "MONTHLY"
 
-@dataclass
+@dataclass(slots=True)
 class Habit:
     """
     Data class representing a habit with its attributes.
@@ -26,7 +26,7 @@ class Habit:
     created_at: datetime
     id: int = None
 
-@dataclass
+@dataclass(slots=True)
 class HabitCompletion:
     """
     Data class representing a habit completion record.
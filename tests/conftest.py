@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The application modules import each other by plain module name (e.g. "from models import ...")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "habit_tracker"))
+
+from db import HabitRepository
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A HabitRepository backed by a fresh database file."""
+    repository = HabitRepository(str(tmp_path / "test.db"))
+    repository.create_tables()
+    yield repository
+    repository.close()
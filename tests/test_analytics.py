@@ -0,0 +1,260 @@
+import os
+import random
+import subprocess
+import sys
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import analytics
+from models import Habit, HabitCompletion, Periodicity
+
+
+def make_completions(days, habit_id=1):
+    return [HabitCompletion(habit_id=habit_id, completed_at=datetime(d.year, d.month, d.day, 12)) for d in days]
+
+
+STREAK_CASES = [
+    # Daily run crossing a month and a year boundary, plus a shorter earlier run
+    (
+        Periodicity.DAILY,
+        [date(2024, 12, 1), date(2024, 12, 2), date(2024, 12, 30), date(2024, 12, 31), date(2025, 1, 1), date(2025, 1, 2)],
+        (4, date(2024, 12, 30), date(2025, 1, 2)),
+    ),
+    # Weekly run crossing ISO weeks over the new year, with two completions in one week
+    (
+        Periodicity.WEEKLY,
+        [date(2024, 12, 25), date(2024, 12, 31), date(2025, 1, 6), date(2025, 1, 12), date(2025, 1, 27)],
+        (3, date(2024, 12, 25), date(2025, 1, 12)),
+    ),
+    # Monthly run crossing the year, with several completions in December
+    (
+        Periodicity.MONTHLY,
+        [date(2024, 11, 30), date(2024, 12, 1), date(2024, 12, 31), date(2025, 1, 15), date(2025, 3, 1)],
+        (3, date(2024, 11, 30), date(2025, 1, 15)),
+    ),
+    # Ties: the earliest streak wins
+    (
+        Periodicity.DAILY,
+        [date(2025, 5, 1), date(2025, 5, 2), date(2025, 5, 10), date(2025, 5, 11)],
+        (2, date(2025, 5, 1), date(2025, 5, 2)),
+    ),
+    (
+        Periodicity.WEEKLY,
+        [date(2025, 5, 5), date(2025, 5, 12), date(2025, 6, 2), date(2025, 6, 13)],
+        (2, date(2025, 5, 5), date(2025, 5, 12)),
+    ),
+    # A single period with several completions is a streak of 1 spanning them
+    (
+        Periodicity.MONTHLY,
+        [date(2025, 2, 3), date(2025, 2, 14), date(2025, 2, 28)],
+        (1, date(2025, 2, 3), date(2025, 2, 28)),
+    ),
+]
+
+
+@pytest.mark.parametrize("periodicity, days, expected", STREAK_CASES)
+def test_get_streak_details(periodicity, days, expected):
+    assert analytics.get_streak_details(make_completions(days), periodicity) == expected
+    assert analytics.get_streak_details(make_completions(reversed(days)), periodicity) == expected
+
+
+@pytest.mark.parametrize("periodicity, days, expected", STREAK_CASES)
+def test_sql_longest_streak_matches_get_streak_details(repo, periodicity, days, expected):
+    habit_id = repo.add_habit(Habit(name="Habit", periodicity=periodicity, created_at=datetime(2024, 1, 1)))
+    repo.add_habit_completions_bulk([(c.habit_id, c.completed_at) for c in make_completions(days, habit_id)])
+
+    completions = repo.list_habit_completions(habit_id)
+    assert repo.longest_streak(habit_id, periodicity) == analytics.get_streak_details(completions, periodicity) == expected
+
+
+def test_longest_streak_without_completions(repo):
+    habit_id = repo.add_habit(Habit(name="Habit", periodicity=Periodicity.DAILY, created_at=datetime(2024, 1, 1)))
+    assert repo.longest_streak(habit_id, Periodicity.DAILY) == (0, None, None)
+    assert analytics.get_streak_details([], Periodicity.DAILY) == (0, None, None)
+
+
+def test_sql_longest_streak_matches_get_streak_details_random(repo):
+    rng = random.Random(0)
+    start = date(2023, 11, 20)
+    for i in range(60):
+        periodicity = rng.choice(list(Periodicity))
+        habit_id = repo.add_habit(Habit(name=f"Habit {i}", periodicity=periodicity, created_at=datetime(2023, 1, 1)))
+        probability = rng.random()
+        days = [start + timedelta(days=offset) for offset in range(rng.choice([10, 120, 500])) if rng.random() < probability]
+        repo.add_habit_completions_bulk([(c.habit_id, c.completed_at) for c in make_completions(days, habit_id)])
+
+        completions = repo.list_habit_completions(habit_id)
+        assert repo.longest_streak(habit_id, periodicity) == analytics.get_streak_details(completions, periodicity)
+
+
+@pytest.mark.parametrize("periodicity, days, expected", STREAK_CASES)
+def test_numpy_streak_details(periodicity, days, expected):
+    pytest.importorskip("numpy")
+    import _analytics_numpy
+
+    assert _analytics_numpy.get_streak_details(make_completions(days), periodicity) == expected
+
+
+def test_numpy_streak_details_matches_python(monkeypatch):
+    pytest.importorskip("numpy")
+    import _analytics_numpy
+
+    # Force the pure-Python implementation for the reference result
+    monkeypatch.setattr(analytics, "NUMPY_MIN_COMPLETIONS", float("inf"))
+    rng = random.Random(1)
+    start = date(2020, 1, 1)
+    for _ in range(100):
+        periodicity = rng.choice(list(Periodicity))
+        probability = rng.random()
+        days = [start + timedelta(days=offset) for offset in range(rng.choice([5, 200, 2000])) if rng.random() < probability]
+        # Duplicate days must not change the result
+        days += rng.sample(days, min(len(days), 20))
+        if not days:
+            continue
+        completions = make_completions(days)
+        rng.shuffle(completions)
+        assert _analytics_numpy.get_streak_details(completions, periodicity) == analytics.get_streak_details(completions, periodicity)
+
+
+@pytest.mark.parametrize("periods, expected", [
+    ([5], (1, 0, 0)),
+    # Repeated periods continue a run without extending it
+    ([1, 1, 2, 2, 2, 3], (3, 0, 5)),
+    # Ties: the earliest run wins, including its trailing repeats
+    ([1, 2, 2, 5, 6], (2, 0, 2)),
+    ([1, 2, 4, 5, 5, 5, 7, 8], (2, 0, 1)),
+    # A later, longer run replaces the earlier one
+    ([1, 1, 3, 4, 5, 5, 9], (3, 2, 5)),
+])
+def test_longest_run_implementations_agree(periods, expected):
+    np = pytest.importorskip("numpy")
+    import _analytics_numpy
+
+    array = np.array(periods, dtype=np.int64)
+    for longest_run in (_analytics_numpy._longest_run_loop, _analytics_numpy._longest_run_vectorized, _analytics_numpy.longest_run):
+        assert tuple(int(value) for value in longest_run(array)) == expected
+
+
+def test_longest_run_implementations_agree_random():
+    np = pytest.importorskip("numpy")
+    import _analytics_numpy
+
+    rng = random.Random(2)
+    for _ in range(2000):
+        periods = np.array(sorted(rng.choices(range(30), k=rng.randint(1, 25))), dtype=np.int64)
+        loop = _analytics_numpy._longest_run_loop(periods)
+        vectorized = _analytics_numpy._longest_run_vectorized(periods)
+        assert tuple(int(value) for value in loop) == tuple(int(value) for value in vectorized)
+
+
+def reference_streak(completions, periodicity, today):
+    """Straightforward current streak: count completed periods back from today (or yesterday's period)."""
+    period_of = analytics.PERIOD_INDEX[periodicity]
+    completed = {period_of(c.completed_at.toordinal()) for c in completions}
+    period = period_of(today.toordinal())
+    if period not in completed:
+        period -= 1
+    streak = 0
+    while period in completed:
+        streak += 1
+        period -= 1
+    return streak
+
+
+@pytest.mark.parametrize("periodicity, days, today, expected", [
+    (Periodicity.DAILY, [date(2025, 1, 3), date(2025, 1, 2), date(2025, 1, 1)], date(2025, 1, 3), 3),
+    # Not done yet today: the streak up to yesterday still counts
+    (Periodicity.DAILY, [date(2025, 1, 2), date(2025, 1, 1), date(2024, 12, 31)], date(2025, 1, 3), 3),
+    (Periodicity.DAILY, [date(2025, 1, 1)], date(2025, 1, 3), 0),
+    # Future completions are ignored
+    (Periodicity.DAILY, [date(2025, 1, 9), date(2025, 1, 3), date(2025, 1, 2)], date(2025, 1, 3), 2),
+    # Several completions in one week count once, across the new year
+    (Periodicity.WEEKLY, [date(2025, 1, 7), date(2025, 1, 6), date(2024, 12, 31), date(2024, 12, 30), date(2024, 12, 24)], date(2025, 1, 8), 3),
+    (Periodicity.MONTHLY, [date(2025, 1, 20), date(2024, 12, 31), date(2024, 12, 1), date(2024, 10, 5)], date(2025, 2, 10), 2),
+])
+def test_calculate_streak(periodicity, days, today, expected):
+    completions = make_completions(days)
+    assert analytics.calculate_streak(completions, periodicity, today) == expected
+    assert analytics.calculate_streak(completions, periodicity, today, sorted_desc=True) == expected
+
+
+def test_calculate_streak_sorted_desc_matches_unsorted():
+    rng = random.Random(3)
+    base = date(2025, 6, 15)
+    for _ in range(1000):
+        periodicity = rng.choice(list(Periodicity))
+        probability = rng.random()
+        # Offsets below zero are completions dated after "today"
+        days = [base - timedelta(days=offset) for offset in range(-10, rng.choice([5, 60, 500])) if rng.random() < probability]
+        # Duplicate days and, for weekly/monthly, several days per period
+        days += rng.sample(days, min(len(days), 10))
+        completions = make_completions(days)
+        completions.sort(key=lambda c: c.completed_at, reverse=True)
+        today = base + timedelta(days=rng.randint(-3, 3))
+
+        expected = reference_streak(completions, periodicity, today)
+        assert analytics.calculate_streak(completions, periodicity, today, sorted_desc=True) == expected
+        rng.shuffle(completions)
+        assert analytics.calculate_streak(completions, periodicity, today) == expected
+
+
+def test_numpy_is_imported_only_when_needed():
+    code = (
+        "import sys; sys.path.insert(0, 'habit_tracker'); import analytics; "
+        "assert 'numpy' not in sys.modules and '_analytics_numpy' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_large_inputs_dispatch_to_numpy(monkeypatch):
+    pytest.importorskip("numpy")
+    import _analytics_numpy
+
+    monkeypatch.setattr(analytics, "NUMPY_MIN_COMPLETIONS", 2)
+    days = [date(2025, 1, 1), date(2025, 1, 2)]
+    assert analytics.get_streak_details(make_completions(days), Periodicity.DAILY) == (2, days[0], days[1])
+    assert analytics._numpy_backend is _analytics_numpy
+
+
+def add_habit_with_completions(repo, periodicity, days, per_day=1):
+    habit = Habit(name="Habit", periodicity=periodicity, created_at=datetime(2020, 1, 1))
+    habit.id = repo.add_habit(habit)
+    repo.add_habit_completions_bulk([
+        (habit.id, datetime(d.year, d.month, d.day, hour))
+        for d in days
+        for hour in range(8, 8 + per_day)
+    ])
+    return habit
+
+
+def full_current_streak(repo, habit, today):
+    return analytics.calculate_streak(repo.list_habit_completions(habit.id), habit.periodicity, today)
+
+
+@pytest.mark.parametrize("periodicity, offsets, per_day, expected", [
+    # More consecutive days than the limit: the streak must not stop at the loaded rows
+    (Periodicity.DAILY, range(1000), 1, 1000),
+    (Periodicity.DAILY, range(analytics.RECENT_COMPLETIONS_LIMIT + 1), 1, analytics.RECENT_COMPLETIONS_LIMIT + 1),
+    # Streak up to yesterday, several rows per day, so the limit covers far fewer days
+    (Periodicity.DAILY, range(1, 301), 3, 300),
+    # A gap inside the loaded rows ends the streak without loading more
+    (Periodicity.DAILY, [d for d in range(1000) if d != 50], 1, 50),
+    # A gap just past the loaded rows
+    (Periodicity.DAILY, [d for d in range(600) if d != analytics.RECENT_COMPLETIONS_LIMIT], 1, analytics.RECENT_COMPLETIONS_LIMIT),
+    (Periodicity.WEEKLY, range(3000), 2, None),
+    (Periodicity.MONTHLY, range(3000), 1, None),
+])
+def test_ongoing_streak_beyond_recent_limit(repo, periodicity, offsets, per_day, expected):
+    today = date(2025, 6, 15)
+    habit = add_habit_with_completions(repo, periodicity, [today - timedelta(days=offset) for offset in offsets], per_day)
+
+    streak = analytics.ongoing_streak(repo, habit, today)
+    assert streak == full_current_streak(repo, habit, today)
+    if expected is not None:
+        assert streak == expected
+
+
+def test_ongoing_streak_without_completions(repo):
+    habit = add_habit_with_completions(repo, Periodicity.DAILY, [])
+    assert analytics.ongoing_streak(repo, habit) == 0
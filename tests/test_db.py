@@ -0,0 +1,87 @@
+import sqlite3
+from datetime import datetime
+
+from db import HabitRepository
+from models import Habit, Periodicity
+
+
+OLD_SCHEMA = """
+    CREATE TABLE habits (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        periodicity TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    );
+    CREATE TABLE habit_completions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        habit_id INTEGER NOT NULL,
+        completed_at TEXT NOT NULL,
+        FOREIGN KEY (habit_id) REFERENCES habits (id) ON DELETE CASCADE
+    );
+    INSERT INTO habits VALUES (1, 'Exercise', 'DAILY', '2025-01-01T08:00:00');
+    INSERT INTO habit_completions (habit_id, completed_at) VALUES (1, '2025-01-02T10:15:00.123456');
+    INSERT INTO habit_completions (habit_id, completed_at) VALUES (1, '2025-01-03T23:59:59');
+"""
+
+
+def test_create_tables_migrates_old_schema(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(OLD_SCHEMA)
+    conn.commit()
+    conn.close()
+
+    repo = HabitRepository(path)
+    repo.create_tables()
+    rows = repo.get_connection().execute(
+        "SELECT completed_at, completed_ordinal FROM habit_completions ORDER BY id"
+    ).fetchall()
+    assert [row["completed_ordinal"] for row in rows] == [
+        datetime(2025, 1, 2).toordinal(),
+        datetime(2025, 1, 3).toordinal(),
+    ]
+
+    # Running it again on an already migrated database changes nothing
+    repo.create_tables()
+    completions = repo.list_habit_completions(1)
+    assert [c.completed_at for c in completions] == [datetime(2025, 1, 3), datetime(2025, 1, 2)]
+    repo.close()
+
+
+def test_completions_are_truncated_to_midnight(repo):
+    habit_id = repo.add_habit(Habit(name="Read", periodicity=Periodicity.DAILY, created_at=datetime(2025, 1, 1)))
+    repo.add_habit_completion(habit_id, datetime(2025, 3, 4, 18, 30, 12))
+    repo.add_habit_completions_bulk([(habit_id, datetime(2025, 3, 5, 7, 5))])
+
+    expected = [datetime(2025, 3, 5), datetime(2025, 3, 4)]
+    assert [c.completed_at for c in repo.list_habit_completions(habit_id)] == expected
+    assert [c.completed_at for c in repo.list_completions_grouped()[habit_id]] == expected
+
+    # The full timestamp is still stored for display
+    assert [row["completed_at"] for row in repo.iter_all_habit_completions()] == [
+        "2025-03-05T07:05:00",
+        "2025-03-04T18:30:12",
+    ]
+
+
+def test_list_all_habit_completions(repo):
+    habit_id = repo.add_habit(Habit(name="Read", periodicity=Periodicity.DAILY, created_at=datetime(2025, 1, 1)))
+    repo.add_habit_completions_bulk([(habit_id, datetime(2025, 3, 4, 18, 30)), (habit_id, datetime(2025, 3, 5, 7, 5))])
+
+    completions = repo.list_all_habit_completions()
+    assert [(c.habit_id, c.completed_at) for c in completions] == [
+        (habit_id, datetime(2025, 3, 5, 7, 5)),
+        (habit_id, datetime(2025, 3, 4, 18, 30)),
+    ]
+    assert all(c.id is not None for c in completions)
+
+
+def test_list_habits_by_periodicity(repo):
+    created_at = datetime(2025, 1, 1, 9, 30)
+    repo.add_habit(Habit(name="Read", periodicity=Periodicity.DAILY, created_at=created_at))
+    repo.add_habit(Habit(name="Run", periodicity=Periodicity.WEEKLY, created_at=created_at))
+
+    weekly = repo.list_habits_by_periodicity(Periodicity.WEEKLY)
+    assert [(h.name, h.periodicity, h.created_at) for h in weekly] == [("Run", Periodicity.WEEKLY, created_at)]
+    assert repo.list_habits_by_periodicity(Periodicity.MONTHLY) == []
+    assert [h.name for h in repo.list_habits()] == ["Read", "Run"]